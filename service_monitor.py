@@ -1,180 +1,601 @@
 #!/usr/bin/env python3
 
 import os
+import asyncio
+import hashlib
 import logging
 import time
-from typing import Dict
-from kubernetes import client, config, watch
-from github import Github
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+import aiohttp
+import orjson
+from kubernetes_asyncio import client, config
+from kubernetes_asyncio.client.rest import ApiException
 
 # Configure logging
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+_log_level = logging.getLevelName(LOG_LEVEL)
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    level=_log_level if isinstance(_log_level, int) else logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    force=True
 )
 logger = logging.getLogger(__name__)
+if not isinstance(_log_level, int):
+    logger.warning("Unknown LOG_LEVEL %s, falling back to INFO", LOG_LEVEL)
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """GitHub configuration, read from the environment once at startup"""
+    token: str
+    repo: str
+    workflow: str
+    tenant: str
+    project: str
+    debounce_key: str
+    tenant_input: str
+    annotations: Tuple[str, ...]
+
+def load_config() -> Config:
+    """Build the configuration from environment variables"""
+    return Config(
+        token=os.environ.get('GITHUB_TOKEN', ''),
+        repo=os.environ.get('GITHUB_REPO', ''),
+        # The dispatch endpoint accepts the workflow file name directly
+        workflow=os.path.basename(os.environ.get('WORKFLOW_FILE', '')),
+        tenant=os.environ.get('TENANT', ''),
+        project=os.environ.get('PROJECT', ''),
+        debounce_key=os.environ.get('DEBOUNCE_KEY', 'global'),
+        # Name of the workflow input that receives TENANT
+        tenant_input=os.environ.get('INPUT_KEY', 'team'),
+        # Service annotations whose changes should trigger the workflow
+        annotations=tuple(
+            name.strip()
+            for name in os.environ.get('WATCHED_ANNOTATIONS', '').split(',')
+            if name.strip()
+        )
+    )
 
 # GitHub configuration
-GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
-GITHUB_REPO = os.environ.get('GITHUB_REPO')
-WORKFLOW_FILE = os.environ.get('WORKFLOW_FILE')
-TENANT = os.environ.get('TENANT')
-PROJECT = os.environ.get('PROJECT')
-
-# Store the last trigger time globally
-last_trigger_global = 0
+CFG = load_config()
+
+# How events are grouped for debouncing: one window for all services,
+# or a separate window per service (namespace/name)
+DEBOUNCE_STRATEGIES: Dict[str, Callable[[str], str]] = {
+    'global': lambda service_key: 'global',
+    'service': lambda service_key: service_key
+}
+
+# Store the last trigger time per debounce key, bounded as an LRU
+_last_trigger_times: "OrderedDict[str, float]" = OrderedDict()
+LAST_TRIGGER_CACHE_SIZE = 4096
 DEBOUNCE_INTERVAL = 180  # 3 minutes in seconds
 
-def set_last_trigger(timestamp: float) -> None:
-    """Update the last trigger timestamp"""
-    global last_trigger_global
-    last_trigger_global = timestamp
+# Backoff state after rate limiting or transient GitHub failures
+_earliest_next_dispatch = 0.0
+_consecutive_failures = 0
+BACKOFF_BASE = 5  # seconds
+BACKOFF_MAX = 900  # 15 minutes in seconds
+SECONDARY_RATE_LIMIT_WAIT = 60  # GitHub asks for at least a minute
+
+# Shared HTTP session for the GitHub API, created on first use and reused
+# across dispatches so each trigger skips client setup and the TLS handshake
+GITHUB_API_URL = 'https://api.github.com'
+_session: Optional[aiohttp.ClientSession] = None
+
+# Pending dispatches handed from the watch task to the dispatcher task;
+# one slot per debounce key so events arriving within the window are coalesced
+_pending: "OrderedDict[str, tuple]" = OrderedDict()
+_pending_changed = asyncio.Event()
+_dispatcher_task: Optional[asyncio.Task] = None
+DISPATCHER_RESTART_DELAY = 5  # seconds
+
+# Last resourceVersion seen on the watch, so reconnects resume instead of relisting
+_resource_version: Optional[str] = None
+WATCH_TIMEOUT = 600  # 10 minutes in seconds
+
+# Let the API server filter on the service type instead of streaming every service
+SERVICE_FIELD_SELECTOR = 'spec.type=LoadBalancer'
+
+# Local store of watched services (uid -> (namespace/name, service fingerprint)),
+# used to ignore events that do not change anything the workflow cares about
+# and to detect services deleted while the watch could not be resumed.
+# Bounded as an LRU to cap memory in very large clusters.
+_service_store: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+SERVICE_STORE_SIZE = 4096
+
+def get_debounce_key(service_key: str) -> str:
+    """Get the debounce key for a service according to the configured strategy"""
+    return DEBOUNCE_STRATEGIES[CFG.debounce_key](service_key)
 
-def get_last_trigger() -> float:
-    """Get the last trigger timestamp"""
-    global last_trigger_global
-    return last_trigger_global
+def set_last_trigger(debounce_key: str, timestamp: float) -> None:
+    """Update the last trigger timestamp for a debounce key"""
+    _last_trigger_times[debounce_key] = timestamp
+    _last_trigger_times.move_to_end(debounce_key)
+    if len(_last_trigger_times) > LAST_TRIGGER_CACHE_SIZE:
+        _last_trigger_times.popitem(last=False)
 
-def trigger_github_workflow(gh_token: str, event_type: str, service_key: str) -> bool:
+def get_last_trigger(debounce_key: str) -> float:
+    """Get the last trigger timestamp for a debounce key"""
+    return _last_trigger_times.get(debounce_key, 0)
+
+def get_earliest_next_dispatch() -> float:
+    """Get the earliest timestamp at which the next dispatch may be sent"""
+    return _earliest_next_dispatch
+
+def parse_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a numeric header value, returning None if it is missing or not a number"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def rate_limit_delay(response: aiohttp.ClientResponse) -> Optional[float]:
+    """
+    Compute how long GitHub asks us to wait before the next request
+
+    Args:
+        response: Response from the GitHub API
+
+    Returns:
+        Optional[float]: Seconds to wait, None if the headers do not ask for a delay
+    """
+    retry_after = parse_seconds(response.headers.get('Retry-After'))
+    if retry_after is not None:
+        return max(0.0, retry_after)
+
+    if response.headers.get('X-RateLimit-Remaining') == '0':
+        reset = parse_seconds(response.headers.get('X-RateLimit-Reset'))
+        if reset is not None:
+            return max(0.0, reset - time.time())
+
+    return None
+
+def is_rate_limited(response: aiohttp.ClientResponse, body: str) -> bool:
+    """
+    Check whether a failed response was caused by a GitHub rate limit
+
+    Args:
+        response: Response from the GitHub API
+        body: Response body
+
+    Returns:
+        bool: True for 429 and for 403 responses from the primary or secondary rate limit
+    """
+    if response.status == 429:
+        return True
+    if response.status != 403:
+        return False
+    return ('Retry-After' in response.headers
+            or response.headers.get('X-RateLimit-Remaining') == '0'
+            or 'rate limit' in body.lower())
+
+def record_dispatch_result(success: bool, delay: float = 0.0) -> None:
+    """
+    Update the backoff state after a dispatch attempt
+
+    Args:
+        success: Whether the dispatch succeeded
+        delay: Minimum delay requested by GitHub before the next request
+    """
+    global _earliest_next_dispatch, _consecutive_failures
+
+    if success:
+        _consecutive_failures = 0
+    else:
+        _consecutive_failures += 1
+        backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (_consecutive_failures - 1))
+        delay = max(delay, backoff)
+
+    _earliest_next_dispatch = time.time() + delay
+    if delay > 0:
+        logger.info("Backing off GitHub dispatches for %d seconds", delay)
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Get the shared GitHub API session, creating it on first use
+
+    Returns:
+        aiohttp.ClientSession: Authenticated session for the GitHub API
+    """
+    global _session
+
+    if _session is None:
+        # Keep a small pool of keep-alive connections to api.github.com.
+        # Never retry the dispatch POST in place: it is not idempotent, and a
+        # gateway error can arrive after GitHub already started the run.
+        # Failed dispatches are retried by the dispatcher's backoff instead.
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=4, keepalive_timeout=75),
+            timeout=aiohttp.ClientTimeout(total=10),
+            headers={
+                'Authorization': f'Bearer {CFG.token}',
+                'Accept': 'application/vnd.github+json',
+                'X-GitHub-Api-Version': '2022-11-28'
+            }
+        )
+    return _session
+
+async def trigger_github_workflow(event_type: str, service_key: str) -> bool:
     """
     Trigger GitHub Actions workflow with debouncing and detailed error logging
     
     Args:
-        gh_token: GitHub authentication token
         event_type: Type of the Kubernetes event
         service_key: Unique identifier for the service (namespace/name)
         
     Returns:
         bool: True if workflow was triggered, False otherwise
     """
-    if not GITHUB_REPO:
-        logger.error("GITHUB_REPO environment variable not set")
-        return False
-    
-    if not WORKFLOW_FILE:
-        logger.error("WORKFLOW_FILE environment variable not set")
-        return False
-
     current_time = time.time()
-    last_trigger_time = get_last_trigger()
+    debounce_key = get_debounce_key(service_key)
+    last_trigger_time = get_last_trigger(debounce_key)
     
     # Check if enough time has passed since the last trigger
     time_since_last = current_time - last_trigger_time
     if time_since_last < DEBOUNCE_INTERVAL:
-        logger.info(f"Skipping workflow trigger for {service_key} due to debouncing (last trigger was {int(time_since_last)} seconds ago)")
+        logger.info("Skipping workflow trigger for %s due to debouncing (last trigger was %d seconds ago)", service_key, time_since_last)
         return False
 
+    if current_time < get_earliest_next_dispatch():
+        logger.info("Skipping workflow trigger for %s due to GitHub backoff", service_key)
+        return False
+
+    url = f"{GITHUB_API_URL}/repos/{CFG.repo}/actions/workflows/{CFG.workflow}/dispatches"
+
+    # Prepare inputs
+    inputs = {
+        CFG.tenant_input: CFG.tenant,
+        "project": CFG.project
+    }
+
+    logger.debug("Triggering workflow dispatch for %s with inputs: %s", CFG.workflow, inputs)
+
     try:
-        logger.info(f"Connecting to GitHub repo: {GITHUB_REPO}")
-        g = Github(gh_token)
-        repo = g.get_repo(GITHUB_REPO)
-        
-        # Get all workflows and log them for debugging
-        workflows = list(repo.get_workflows())
-        logger.info(f"Found {len(workflows)} workflows in repository")
-        for wf in workflows:
-            logger.info(f"Available workflow: {wf.path} (ID: {wf.id})")
-        
-        # Get the workflow by filename
-        workflow = None
-        for wf in workflows:
-            if wf.path.endswith(WORKFLOW_FILE):
-                workflow = wf
-                logger.info(f"Found matching workflow: {wf.path} (ID: {wf.id})")
-                break
-        
-        if workflow is None:
-            logger.error(f"Workflow {WORKFLOW_FILE} not found in repository {GITHUB_REPO}")
-            return False
-
-        # Prepare inputs
-        inputs = {
-            "team": TENANT or "",
-            "project": PROJECT or ""
-        }
-        
-        logger.info(f"Triggering workflow dispatch for {workflow.path} with inputs: {inputs}")
-        
-        # Create workflow dispatch event with inputs
-        try:
-            workflow.create_dispatch(
-                ref="main",  # You might want to make this configurable
-                inputs=inputs
-            )
-            # Update the last trigger time only on successful dispatch
-            set_last_trigger(current_time)
-            logger.info(f"Successfully triggered workflow {workflow.path} for event: {event_type} (service: {service_key})")
-            return True
-            
-        except Exception as dispatch_error:
-            logger.error(f"Failed to dispatch workflow: {str(dispatch_error)}")
-            # Try to get more details about the error
-            if hasattr(dispatch_error, 'response'):
-                response = getattr(dispatch_error, 'response')
-                if response:
-                    logger.error(f"GitHub API Response: {response.status_code} - {response.text}")
-            return False
-    
-    except Exception as e:
-        logger.error(f"Failed to trigger workflow: {str(e)}")
-        # Try to get more details about the error
-        if hasattr(e, 'response'):
-            response = getattr(e, 'response')
-            if response:
-                logger.error(f"GitHub API Response: {response.status_code} - {response.text}")
+        async with get_session().post(
+            url,
+            json={
+                'ref': 'main',  # You might want to make this configurable
+                'inputs': inputs
+            }
+        ) as response:
+            delay = rate_limit_delay(response)
+            if response.status != 204:
+                body = await response.text()
+                logger.error("Failed to dispatch workflow: GitHub API Response: %s - %s", response.status, body)
+                # Only back off (and retry) on rate limiting and server errors;
+                # other client errors will not succeed by waiting
+                if is_rate_limited(response, body):
+                    if response.status == 403:
+                        delay = max(delay or 0.0, SECONDARY_RATE_LIMIT_WAIT)
+                    record_dispatch_result(False, delay or 0.0)
+                elif response.status >= 500:
+                    record_dispatch_result(False, delay or 0.0)
+                return False
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error("Failed to trigger workflow: %s", e)
+        record_dispatch_result(False)
         return False
 
-def watch_services():
+    # Update the last trigger time only on successful dispatch
+    record_dispatch_result(True, delay or 0.0)
+    set_last_trigger(debounce_key, current_time)
+    logger.info("Successfully triggered workflow %s for event: %s (service: %s)", CFG.workflow, event_type, service_key)
+    return True
+
+def enqueue_dispatch(event_type: str, service_key: str, replace: bool = True) -> None:
+    """
+    Hand an event to the dispatcher task without waiting on GitHub
+
+    Args:
+        event_type: Type of the Kubernetes event
+        service_key: Unique identifier for the service (namespace/name)
+        replace: Whether to replace an already pending event for the same debounce key
+    """
+    debounce_key = get_debounce_key(service_key)
+    if debounce_key in _pending:
+        logger.debug("Coalescing %s event for %s into pending workflow trigger", event_type, service_key)
+        if not replace:
+            return
+    _pending[debounce_key] = (event_type, service_key)
+    _pending_changed.set()
+
+async def _dispatcher_loop() -> None:
+    """
+    Consume pending events and trigger the workflow at most once per debounce window
+    """
+    while True:
+        _pending_changed.clear()
+        if not _pending:
+            await _pending_changed.wait()
+            continue
+
+        # Wait out the remainder of the debounce window (or any GitHub backoff)
+        # so the events arriving meanwhile collapse into a single dispatch
+        debounce_key, next_allowed = min(
+            ((key, max(get_last_trigger(key) + DEBOUNCE_INTERVAL, get_earliest_next_dispatch()))
+             for key in _pending),
+            key=lambda item: item[1]
+        )
+        wait_time = next_allowed - time.time()
+        if wait_time > 0:
+            logger.debug("Delaying workflow trigger for %d seconds due to debouncing", wait_time)
+            try:
+                await asyncio.wait_for(_pending_changed.wait(), wait_time)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        # Take the most recent event that arrived while waiting
+        event_type, service_key = _pending.pop(debounce_key)
+
+        try:
+            triggered = await trigger_github_workflow(event_type, service_key)
+        except Exception:
+            logger.exception("Unexpected error triggering workflow for %s", service_key)
+            record_dispatch_result(False)
+            triggered = False
+
+        # Retry after the backoff if the dispatch failed with a transient error,
+        # unless a newer event for the same key is already pending
+        if not triggered and get_earliest_next_dispatch() > time.time():
+            enqueue_dispatch(event_type, service_key, replace=False)
+
+def start_dispatcher() -> None:
+    """
+    Start the dispatcher task, restarting it if it ever stops with an error
+    """
+    global _dispatcher_task
+
+    _dispatcher_task = asyncio.create_task(_dispatcher_loop())
+    _dispatcher_task.add_done_callback(_on_dispatcher_done)
+
+def _on_dispatcher_done(task: asyncio.Task) -> None:
+    """Log a crashed dispatcher task and schedule its restart"""
+    if task.cancelled():
+        return
+    logger.error("Dispatcher stopped unexpectedly, restarting in %d seconds", DISPATCHER_RESTART_DELAY,
+                 exc_info=task.exception())
+    asyncio.get_running_loop().call_later(DISPATCHER_RESTART_DELAY, start_dispatcher)
+
+def service_fingerprint(service) -> bytes:
+    """
+    Compute a fingerprint of the parts of a service the workflow cares about
+
+    Args:
+        service: Service object as decoded from the watch stream
+
+    Returns:
+        bytes: Digest of the ports, load balancer ingress and watched annotations
+    """
+    annotations = service['metadata'].get('annotations') or {}
+    ports = service.get('spec', {}).get('ports') or []
+    ingress = service.get('status', {}).get('loadBalancer', {}).get('ingress') or []
+    # OPT_SORT_KEYS only orders dict keys, so sort the lists to ignore reordering
+    relevant = {
+        'ports': sorted(ports, key=lambda port: (port.get('name', ""), port.get('port', 0), port.get('protocol', ""))),
+        'ingress': sorted(ingress, key=lambda entry: (entry.get('ip', ""), entry.get('hostname', ""))),
+        'annotations': {name: annotations.get(name) for name in CFG.annotations}
+    }
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(orjson.dumps(relevant, option=orjson.OPT_SORT_KEYS))
+    return digest.digest()
+
+def has_relevant_change(event_type: str, service) -> bool:
+    """
+    Update the local service store and report whether the event changes it
+
+    Args:
+        event_type: Type of the Kubernetes event
+        service: Service object as decoded from the watch stream
+
+    Returns:
+        bool: True if the service is new, deleted or its fingerprint changed
+    """
+    metadata = service['metadata']
+    uid = metadata['uid']
+    if event_type == 'DELETED':
+        _service_store.pop(uid, None)
+        return True
+
+    fingerprint = service_fingerprint(service)
+    previous = _service_store.get(uid)
+    _service_store[uid] = (f"{metadata['namespace']}/{metadata['name']}", fingerprint)
+    _service_store.move_to_end(uid)
+    if len(_service_store) > SERVICE_STORE_SIZE:
+        _service_store.popitem(last=False)
+    return previous is None or previous[1] != fingerprint
+
+async def check_response(response: aiohttp.ClientResponse) -> None:
+    """
+    Raise an ApiException for a failed raw (non-preloaded) API server response
+
+    Args:
+        response: aiohttp response of a list or watch request
+    """
+    if response.status != 200:
+        raise ApiException(status=response.status, reason=await response.text())
+
+async def resync_services(v1) -> str:
+    """
+    List LoadBalancer services and reconcile the local store with the result
+
+    Services that are new or changed are queued as ADDED, and services in the
+    store that are missing from the list are queued as DELETED, since their
+    DELETED event was lost with the watch that could not be resumed.
+
+    Args:
+        v1: CoreV1Api client
+
+    Returns:
+        str: resourceVersion of the list, to start the watch from
+    """
+    response = await v1.list_service_for_all_namespaces(
+        field_selector=SERVICE_FIELD_SELECTOR,
+        _preload_content=False
+    )
+    try:
+        await check_response(response)
+        service_list = orjson.loads(await response.read())
+    finally:
+        response.release()
+
+    listed = set()
+    for service in service_list.get('items') or []:
+        metadata = service['metadata']
+        listed.add(metadata['uid'])
+        if has_relevant_change('ADDED', service):
+            enqueue_dispatch('ADDED', f"{metadata['namespace']}/{metadata['name']}")
+
+    for uid in [uid for uid in _service_store if uid not in listed]:
+        service_key, _ = _service_store.pop(uid)
+        logger.debug("Service %s disappeared while the watch was down", service_key)
+        enqueue_dispatch('DELETED', service_key)
+
+    return service_list['metadata']['resourceVersion']
+
+async def iter_watch_events(response: aiohttp.ClientResponse) -> AsyncIterator[dict]:
+    """
+    Decode watch events from a raw (non-preloaded) API server response
+
+    Args:
+        response: aiohttp response of a watch request
+
+    Yields:
+        dict: One decoded watch event per line of the stream
+    """
+    # Split the stream ourselves: StreamReader.readline() rejects lines over
+    # 128 KiB, which services with large annotations can exceed
+    buffer = b""
+    async for chunk in response.content.iter_any():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield orjson.loads(line)
+    if buffer.strip():
+        yield orjson.loads(buffer)
+
+async def watch_services():
     """
     Watch for changes in LoadBalancer services
     """
+    global _resource_version
+
     try:
         # Try to load in-cluster config first
         try:
             config.load_incluster_config()
         except config.ConfigException:
-            config.load_kube_config()
+            await config.load_kube_config()
 
-        v1 = client.CoreV1Api()
-        w = watch.Watch()
-        
-        logger.info("Starting to watch LoadBalancer services...")
-        
-        for event in w.stream(v1.list_service_for_all_namespaces):
-            service = event['object']
+        async with client.ApiClient() as api_client:
+            v1 = client.CoreV1Api(api_client)
             
-            # Only process LoadBalancer services
-            if service.spec.type == 'LoadBalancer':
-                event_type = event['type']
-                logger.info(f"LoadBalancer service event: {event_type} - {service.metadata.namespace}/{service.metadata.name}")
-                
-                # Trigger workflow for relevant events
-                if event_type in ['ADDED', 'MODIFIED', 'DELETED']:
-                    if GITHUB_TOKEN:
-                        service_key = f"{service.metadata.namespace}/{service.metadata.name}"
-                        trigger_github_workflow(GITHUB_TOKEN, event_type, service_key)
-                    else:
-                        logger.error("GITHUB_TOKEN environment variable not set")
+            # Without a resourceVersion to resume from, list first and watch from the list
+            if not _resource_version:
+                logger.info("Listing LoadBalancer services...")
+                _resource_version = await resync_services(v1)
+
+            logger.info("Starting to watch LoadBalancer services...")
+
+            watch_kwargs = {
+                'field_selector': SERVICE_FIELD_SELECTOR,
+                'timeout_seconds': WATCH_TIMEOUT,
+                'allow_watch_bookmarks': True,
+                'resource_version': _resource_version
+            }
+
+            # Read the raw stream and decode it with orjson, skipping the
+            # conversion of every event into V1Service model objects
+            response = await v1.list_service_for_all_namespaces(
+                watch=True,
+                _preload_content=False,
+                # Leave the server-side timeout room to end the watch cleanly
+                _request_timeout=WATCH_TIMEOUT + 30,
+                **watch_kwargs
+            )
+            try:
+                await check_response(response)
+                async for event in iter_watch_events(response):
+                    event_type = event['type']
+                    service = event['object']
+
+                    if event_type == 'ERROR':
+                        raise ApiException(status=service.get('code'), reason=service.get('message'))
+
+                    metadata = service['metadata']
+                    _resource_version = metadata['resourceVersion']
+                    if event_type == 'BOOKMARK':
+                        continue
+
+                    service_key = f"{metadata['namespace']}/{metadata['name']}"
+                    logger.debug("LoadBalancer service event: %s - %s", event_type, service_key)
+                    
+                    # Trigger workflow for relevant events
+                    if event_type in ['ADDED', 'MODIFIED', 'DELETED']:
+                        if not has_relevant_change(event_type, service):
+                            logger.debug("Ignoring %s event without relevant changes - %s", event_type, service_key)
+                            continue
+
+                        enqueue_dispatch(event_type, service_key)
+            finally:
+                response.release()
+
+    except ApiException as e:
+        if e.status == 410:
+            # Our resourceVersion is too old to resume from; relist on the next watch
+            logger.info("Watch resource version expired, restarting watch from a fresh list")
+            _resource_version = None
+            return
+        logger.error("Error watching services: %s", e)
+        raise
 
     except Exception as e:
-        logger.error(f"Error watching services: {str(e)}")
+        logger.error("Error watching services: %s", e)
         raise
 
+async def run() -> None:
+    """
+    Run the dispatcher and keep the service watch connected
+    """
+    start_dispatcher()
+
+    failures = 0
+    while True:
+        try:
+            await watch_services()
+            failures = 0
+        except Exception as e:
+            logger.error("Error in main loop: %s", e)
+            failures += 1
+            # Reconnect right away after a dropped watch; only wait a bit
+            # if the API server keeps failing
+            if failures > 1:
+                await asyncio.sleep(5)
+
 def main():
     """
     Main function to start the service monitor
     """
-    if not GITHUB_TOKEN:
+    if not CFG.token:
         logger.error("GITHUB_TOKEN environment variable must be set")
         exit(1)
 
-    while True:
-        try:
-            watch_services()
-        except Exception as e:
-            logger.error(f"Error in main loop: {str(e)}")
-            # Wait a bit before retrying
-            time.sleep(5)
+    if not CFG.repo:
+        logger.error("GITHUB_REPO environment variable must be set")
+        exit(1)
+
+    if not CFG.workflow:
+        logger.error("WORKFLOW_FILE environment variable must be set")
+        exit(1)
+
+    if CFG.debounce_key not in DEBOUNCE_STRATEGIES:
+        logger.error("DEBOUNCE_KEY must be one of: %s", ", ".join(DEBOUNCE_STRATEGIES))
+        exit(1)
+
+    asyncio.run(run())
 
 if __name__ == "__main__":
     main()